@@ -12,13 +12,17 @@ It performs:
 
 This script does best-effort error handling and prints outcomes for azd logs.
 """
+import inspect
 import os
 import sys
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 
 try:
     from azure.ai.projects import AIProjectClient
-    from azure.identity import DefaultAzureCredential, ClientSecretCredential
+    from azure.identity import DefaultAzureCredential, ClientSecretCredential, TokenCachePersistenceOptions
     from azure.keyvault.secrets import SecretClient
 except Exception:
     print("Required Azure SDKs are not installed in the environment. Skipping agent creation.")
@@ -27,6 +31,12 @@ except Exception:
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("create-agent")
 
+def _parse_arm_id(rid):
+    """Split an ARM resource id into a {segment: value} dict, e.g. {"resourceGroups": "rg"}."""
+    parts = rid.split("/")
+    return dict(zip(parts[1::2], parts[2::2]))
+
+
 # Load config from environment that azd sets during provision
 endpoint = os.getenv("AZURE_AI_ENDPOINT") or os.getenv("AI_FOUNDRY_ACCOUNT_ENDPOINT") or os.getenv("PROJECT_ENDPOINT")
 subscription_id = os.getenv("AZURE_SUBSCRIPTION_ID")
@@ -34,11 +44,8 @@ subscription_id = os.getenv("AZURE_SUBSCRIPTION_ID")
 resource_group = os.getenv("AZURE_RESOURCE_GROUP_NAME") or os.getenv("AZURE_RESOURCE_GROUP")
 if not resource_group:
     account_id = os.getenv("AI_FOUNDRY_ACCOUNT_ID") or os.getenv("AZURE_COG_ACCOUNT_ID")
-    if account_id and "/resourceGroups/" in account_id:
-        try:
-            resource_group = account_id.split("/resourceGroups/")[1].split("/")[0]
-        except Exception:
-            resource_group = None
+    if account_id:
+        resource_group = _parse_arm_id(account_id).get("resourceGroups")
 project_name = os.getenv("AZURE_AI_PROJECT_NAME") or os.getenv("AI_FOUNDRY_PROJECT_NAME")
 # Model name fallback: prefer AZURE_MODEL but fall back to AI_FOUNDRY_DEPLOYMENT_MODEL_NAME
 model_name = os.getenv("AZURE_MODEL") or os.getenv("AI_FOUNDRY_DEPLOYMENT_MODEL_NAME")
@@ -48,47 +55,129 @@ if not endpoint or not subscription_id or not resource_group or not project_name
     log.info("Missing AI project configuration (endpoint/subscription/resource-group/project/model). Skipping agent creation.")
     sys.exit(0)
 
+# Scope used to probe the persistent token cache: the first service the script talks to
+_PROBE_SCOPE = "https://vault.azure.net/.default" if kv_endpoint else "https://ai.azure.com/.default"
+
+
 # Build credential
 def _build_credential():
     client_id = os.getenv("AZURE_CLIENT_ID")
     client_secret = os.getenv("AZURE_CLIENT_SECRET")
     tenant_id = os.getenv("AZURE_TENANT_ID")
     if client_id and client_secret and tenant_id:
-        return ClientSecretCredential(tenant_id=tenant_id, client_id=client_id, client_secret=client_secret)
+        # Persist the token cache on disk so repeated azd-ups reuse the token instead of
+        # performing a fresh AAD exchange every run. Unencrypted storage is allowed because
+        # CI/dev containers often lack a keyring; the cache only holds short-lived tokens.
+        credential = ClientSecretCredential(
+            tenant_id=tenant_id,
+            client_id=client_id,
+            client_secret=client_secret,
+            cache_persistence_options=TokenCachePersistenceOptions(
+                name="azd-create-agent", allow_unencrypted_storage=True
+            ),
+        )
+        # An unusable persistent cache only fails on the first token request, not in the
+        # constructor, so probe it here (the token is the one phase 1/2 need anyway).
+        # Only cache/persistence failures fall back: azure-identity raises ValueError when
+        # no persistence is available, msal-extensions raises OSError subclasses, and a
+        # missing msal-extensions is an ImportError. Auth and network errors propagate.
+        try:
+            credential.get_token(_PROBE_SCOPE)
+            return credential
+        except (ValueError, OSError, ImportError) as ex:
+            log.info(
+                "Persistent token cache unavailable (%s: %s); retrying without the persistent cache.",
+                type(ex).__name__, ex,
+            )
+            return ClientSecretCredential(tenant_id=tenant_id, client_id=client_id, client_secret=client_secret)
     return DefaultAzureCredential()
 
-cred = _build_credential()
 
-# Create project client.
-# Prefer a project-scoped endpoint when a project name is available; some SDK calls expect
-# the endpoint to include the /api/projects/{projectName} path, otherwise requests can return 404.
-project_endpoint = None
-if project_name:
-    project_endpoint = endpoint.rstrip("/") + f"/api/projects/{project_name}"
-try:
-    client = AIProjectClient(credential=cred, endpoint=project_endpoint or endpoint)
-except Exception as e:
-    # SDK variations / fallbacks
-    base_endpoint = endpoint.split("/api/projects/")[0] if "/api/projects/" in endpoint else endpoint
-    client = AIProjectClient(
-        credential=cred,
-        endpoint=project_endpoint or base_endpoint,
-        subscription_id=subscription_id,
-        resource_group_name=resource_group,
-        project_name=project_name,
-    )
-
-# Try to load existing agent id from keyvault if available
+@lru_cache(maxsize=1)
+def get_credential():
+    """Return the shared credential so every client reuses the same token cache."""
+    return _build_credential()
+
+
+# Write to local env file used by azd. Prefer the repository root .azure/dev/.env when possible.
+# If AZD_ENV_FILE is provided, honor it. Otherwise walk up from this script to the repo root
+# (identified by .git or azure.yaml) so we write to <repo>/.azure/dev/.env. Fall back to the
+# current working directory when no root is found (this was the previous behavior).
+def _repo_root(start):
+    p = Path(start).resolve()
+    for q in [p, *p.parents]:
+        if (q / ".git").exists() or (q / "azure.yaml").exists():
+            return q
+    return None
+
+
+env_path = os.getenv("AZD_ENV_FILE")
+if not env_path:
+    repo_root = _repo_root(__file__) or Path.cwd()
+    env_path = str(repo_root / ".azure" / "dev" / ".env")
+
+# Marker recording the last agent id that was validated against the project. When the Key Vault
+# secret matches it, repeated azd-ups on the same machine skip building the project client.
+verified_marker = os.path.join(os.path.dirname(env_path), ".agent_id_verified")
+
+
+def _read_verified_marker():
+    try:
+        with open(verified_marker) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_verified_marker(value):
+    try:
+        os.makedirs(os.path.dirname(verified_marker), exist_ok=True)
+        with open(verified_marker, "w") as f:
+            f.write(value)
+    except OSError as ex:
+        log.debug("Failed to write verified agent marker: %s", ex)
+
+
+def _create_project_client():
+    # Prefer a project-scoped endpoint when a project name is available; some SDK calls expect
+    # the endpoint to include the /api/projects/{projectName} path, otherwise requests can return 404.
+    project_endpoint = None
+    if project_name:
+        project_endpoint = endpoint.rstrip("/") + f"/api/projects/{project_name}"
+    # SDK variations: some versions also take subscription/resource group/project. Inspect the
+    # constructor once and only pass what it accepts, instead of retrying on failure.
+    params = inspect.signature(AIProjectClient.__init__).parameters
+    kwargs = {"credential": get_credential(), "endpoint": project_endpoint or endpoint}
+    for key, value in (
+        ("subscription_id", subscription_id),
+        ("resource_group_name", resource_group),
+        ("project_name", project_name),
+    ):
+        if key in params:
+            kwargs[key] = value
+    return AIProjectClient(**kwargs)
+
+
+# Phase 1: try to load existing agent id from keyvault if available
 agent_id = None
+kv = None
 if kv_endpoint:
     try:
-        kv = SecretClient(vault_url=kv_endpoint, credential=cred)
+        kv = SecretClient(vault_url=kv_endpoint, credential=get_credential())
         sec = kv.get_secret("azure-agent-id")
         agent_id = sec.value
         log.info("Loaded agent id from Key Vault: %s", agent_id)
     except Exception:
         log.info("No azure-agent-id secret present in Key Vault (or access denied).")
 
+if agent_id and agent_id == _read_verified_marker():
+    log.info("Agent already exists (id=%s, previously verified). Nothing to do.", agent_id)
+    print(agent_id)
+    sys.exit(0)
+
+# Phase 2: only build the project client when the agent id is missing or unverified
+client = _create_project_client()
+
 # Validate existing agent id
 if agent_id:
     try:
@@ -98,41 +187,45 @@ if agent_id:
         log.info("Agent id from KV not valid; will create a new agent.")
         agent_id = None
 
+def _write_env_file(path, value):
+    # Ensure directory
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Append or create with a single write; 0o600 keeps the file private to the current user
+    payload = f"AZURE_AGENT_ID=\"{value}\"\n".encode()
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+    try:
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
+    log.info("Wrote AZURE_AGENT_ID to %s", path)
+
+
 # Create agent if none
+created = False
 if not agent_id:
     log.info("Creating agent using model=%s", model_name)
     a = client.agents.create_agent(model=model_name, name="The Globe Assistant", instructions="You are The Globe's helpful assistant.")
     agent_id = a.id
+    created = True
     log.info("Created agent id=%s", agent_id)
-    # Persist to keyvault if available
-    if kv_endpoint:
+
+_write_verified_marker(agent_id)
+
+# The Key Vault write is a network round-trip and the env file append is local disk I/O;
+# run them side by side so the disk write hides behind the RTT.
+with ThreadPoolExecutor(max_workers=2) as ex:
+    kv_future = ex.submit(kv.set_secret, "azure-agent-id", agent_id) if created and kv is not None else None
+    env_future = ex.submit(_write_env_file, env_path, agent_id)
+
+    if kv_future is not None:
         try:
-            kv.set_secret("azure-agent-id", agent_id)
+            kv_future.result()
             log.info("Persisted agent id to Key Vault")
-        except Exception as ex:
-            log.warning("Failed to persist agent id to Key Vault: %s", ex)
-
-# Write to local env file used by azd. Prefer the repository root .azure/dev/.env when possible.
-# If AZD_ENV_FILE is provided, honor it. Otherwise attempt to discover the git repo root
-# so we write to <repo>/.azure/dev/.env. Fall back to the current working directory when git
-# isn't available (this was the previous behavior).
-env_path = os.getenv("AZD_ENV_FILE")
-if not env_path:
+        except Exception as err:
+            log.warning("Failed to persist agent id to Key Vault: %s", err)
     try:
-        import subprocess
-
-        repo_root = subprocess.check_output(["git", "rev-parse", "--show-toplevel"]).decode().strip()
-        env_path = os.path.join(repo_root, ".azure", "dev", ".env")
-    except Exception:
-        env_path = os.path.join(os.getcwd(), ".azure", "dev", ".env")
-try:
-    # Ensure directory
-    os.makedirs(os.path.dirname(env_path), exist_ok=True)
-    # Append or create
-    with open(env_path, "a") as f:
-        f.write(f"AZURE_AGENT_ID=\"{agent_id}\"\n")
-    log.info("Wrote AZURE_AGENT_ID to %s", env_path)
-except Exception as ex:
-    log.warning("Failed to write agent id to local env file: %s", ex)
+        env_future.result()
+    except Exception as err:
+        log.warning("Failed to write agent id to local env file: %s", err)
 
 print(agent_id)
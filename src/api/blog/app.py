@@ -1,22 +1,28 @@
-import motor
-from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
 from beanie import init_beanie
+from pymongo import AsyncMongoClient
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from opentelemetry.sdk.resources import SERVICE_NAME, Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from fastapi.responses import ORJSONResponse
+import asyncio
+import functools
+import hashlib
+import logging
 import os
+import time
 from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
 from dotenv import load_dotenv
-from dotenv import load_dotenv
 
-# Load environment variables from .env so dev flags like API_ENVIRONMENT are applied
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_dotenv_once() -> None:
+    load_dotenv()
 
-# Load environment variables from .env if present (for local dev convenience)
-load_dotenv()
+
+# Load environment variables from .env so dev flags like API_ENVIRONMENT are applied.
+_load_dotenv_once()
 
 # Use API_ALLOW_ORIGINS env var with comma separated urls like
 # `http://localhost:300, http://otherurl:100`
@@ -29,10 +35,11 @@ allowOrigins = os.environ.get('API_ALLOW_ORIGINS')
 # allowing all origins.
 environment = os.environ.get('API_ENVIRONMENT')
 
+@functools.lru_cache(maxsize=1)
 def originList():
     if environment is not None and environment == "develop":
-        print("Allowing requests from any origins. API_ENVIRONMENT=", environment)
-        return ["*"]
+        logger.info("Allowing requests from any origins. API_ENVIRONMENT=%s", environment)
+        return ("*",)
 
     origins = [
         "https://portal.azure.com",
@@ -40,63 +47,89 @@ def originList():
     ]
 
     if allowOrigins is not None:
+        config_path = Path(__file__)
         for origin in allowOrigins.split(","):
             origin = origin.strip()
             if origin:
-                print("Allowing requests from", origin, ". To change or disable, go to ", Path(__file__))
+                logger.info("Allowing requests from %s. To change or disable, go to %s", origin, config_path)
                 origins.append(origin)
 
-    # Always include common local dev origins if not in develop but explicitly allowed via env
-    print("CORS allowed origins:", origins)
-    return origins
-    
-from .models import Settings, __beanie_models__
+    logger.info("CORS allowed origins: %s", origins)
+    return tuple(origins)
+
+from .models import __beanie_models__, get_settings
 
-settings = Settings()
+settings = get_settings()
 
 # Global variable to track initialization
 _beanie_initialized = False
 
+# Serializes initialization between the startup hook and the init middleware
+_init_lock = asyncio.Lock()
+
+# Lazily-created async Mongo client shared by startup, the init middleware and /db-status
+_mongo_client = None
+
+# certifi CA bundle path, resolved once on first TLS client creation
+_certifi_ca_file = None
+
+# Never drop unknown indexes or rebuild views on init: both cost extra
+# round-trips per collection on Cosmos DB and the models' indexes are
+# additive, so create_indexes alone keeps them reconciled.
+BEANIE_INIT_OPTIONS = {"allow_index_dropping": False, "recreate_views": False}
+
+# Hash of the models' index definitions, recorded in the database after Beanie
+# has created the indexes. Cold starts whose models are unchanged find a
+# matching hash and skip the per-collection index reconciliation entirely.
+INDEX_STATE_COLLECTION = "_beanie_index_state"
+
+
+@functools.lru_cache(maxsize=1)
+def _index_definitions_hash() -> str:
+    spec = [
+        (model.__name__, [index.document for index in getattr(model.Settings, "indexes", [])])
+        for model in __beanie_models__
+    ]
+    return hashlib.sha256(repr(spec).encode()).hexdigest()
+
+# Upper bound for the startup connectivity ping
+STARTUP_PING_TIMEOUT_SECONDS = 5
+
 # Middleware to ensure Beanie is initialized before processing requests.
-import asyncio
 import json
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 
-def create_motor_client(conn_str: str):
-    """Create a Motor client. Enable TLS when requested in the connection string.
+def create_mongo_client(conn_str: str):
+    """Create an async PyMongo client. Enable TLS when requested in the connection string.
 
     The connection string can include `tls=false` (or `ssl=false`) for local
     non-TLS MongoDB instances (useful in CI). When TLS is enabled, the certifi
     CA bundle is used for verification.
     """
-    import motor.motor_asyncio
-    import certifi
+    global _certifi_ca_file
 
     # If no connection string is provided, default to a local MongoDB
-    # instance without TLS. Calling Motor/pymongo with an empty connection
+    # instance without TLS. Calling pymongo with an empty connection
     # string raises ConfigurationError (empty host), which we saw in logs.
     if not conn_str:
-        print("AZURE_COSMOS_CONNECTION_STRING is empty; defaulting to 'mongodb://localhost:27017/?tls=false'")
+        logger.warning("AZURE_COSMOS_CONNECTION_STRING is empty; defaulting to 'mongodb://localhost:27017/?tls=false'")
         conn_str = "mongodb://localhost:27017/?tls=false"
 
+    # Parse the query string once; option names are case-insensitive in
+    # MongoDB URIs, so normalize keys and values.
+    options = {
+        k.lower(): v[0].lower()
+        for k, v in parse_qs(urlsplit(conn_str).query).items()
+    }
+
     # Default to using TLS. If the connection string explicitly disables TLS
     # (e.g. `mongodb://localhost:27017/?tls=false`) then turn it off so a
     # local, non-TLS mongod can be used in CI.
-    use_tls = True
-    if conn_str:
-        low = conn_str.lower()
-        if 'tls=false' in low or 'ssl=false' in low:
-            use_tls = False
+    use_tls = options.get("tls", "true") != "false" and options.get("ssl", "true") != "false"
 
     # Decide whether to set directConnection based on the connection string
-    direct_conn = None
-    if conn_str:
-        lowcs = conn_str.lower()
-        if 'directconnection=true' in lowcs:
-            direct_conn = True
-        elif 'directconnection=false' in lowcs:
-            direct_conn = False
+    direct_conn = {"true": True, "false": False}.get(options.get("directconnection"))
 
     # Build common kwargs and only include directConnection if explicitly requested
     common_kwargs = {
@@ -108,71 +141,90 @@ def create_motor_client(conn_str: str):
 
     if use_tls:
         # When using TLS, provide the certifi CA bundle and sensible timeouts.
-        return motor.motor_asyncio.AsyncIOMotorClient(
+        if _certifi_ca_file is None:
+            import certifi
+            _certifi_ca_file = certifi.where()
+        return AsyncMongoClient(
             conn_str,
             tls=True,
-            tlsCAFile=certifi.where(),
+            tlsCAFile=_certifi_ca_file,
             **common_kwargs,
         )
     else:
-        return motor.motor_asyncio.AsyncIOMotorClient(
+        return AsyncMongoClient(
             conn_str,
             tls=False,
             **common_kwargs,
         )
 
 
-def test_sync_connection(conn_str: str, timeout_ms: int = 10000):
-    """Quick synchronous connectivity test using pymongo.MongoClient.
+def get_mongo_client():
+    """Return the process-wide async Mongo client, creating it on first use.
 
-    Motor/Mongo async pings sometimes fail in environments where a
-    synchronous server_info() succeeds. Use this lightweight check to
-    decide whether to attempt full async initialization.
+    Mongo clients own a connection pool and perform DNS/TLS/topology discovery
+    when created, so they are meant to be reused rather than built per call.
     """
-    try:
-        from pymongo import MongoClient
-        import certifi
-    except Exception:
-        # If pymongo isn't available, fall back to raising so callers know
-        raise
-
-    client = MongoClient(
-        conn_str,
-        tls=True,
-        tlsCAFile=certifi.where(),
-        serverSelectionTimeoutMS=timeout_ms,
-        connectTimeoutMS=timeout_ms,
-    )
-    # server_info will raise on failure; return the result on success
-    return client.server_info()
+    global _mongo_client
+    if _mongo_client is None:
+        _mongo_client = create_mongo_client(settings.AZURE_COSMOS_CONNECTION_STRING)
+    return _mongo_client
+
+
+async def _initialize_database() -> None:
+    """Connect to the database and initialize Beanie exactly once.
+
+    Shared by the startup hook and the request middleware. The lock makes a
+    request that arrives while startup is still initializing wait for that
+    work instead of running a second, racing init_beanie.
+    """
+    global _beanie_initialized
+    async with _init_lock:
+        if _beanie_initialized:
+            return
+        logger.debug("Initializing Beanie...")
+        client = get_mongo_client()
+
+        database = client[settings.AZURE_COSMOS_DATABASE_NAME]
+        logger.debug("Connected to database: %s", settings.AZURE_COSMOS_DATABASE_NAME)
+
+        # The ping and the index-state read are independent round-trips; run
+        # them together to save an RTT on cold start. The ping is bounded so an
+        # unreachable server fails fast instead of holding startup for the full
+        # server-selection timeout.
+        index_state = database[INDEX_STATE_COLLECTION]
+        index_hash = _index_definitions_hash()
+        _, stored_state = await asyncio.gather(
+            asyncio.wait_for(client.admin.command('ping'), timeout=STARTUP_PING_TIMEOUT_SECONDS),
+            index_state.find_one({"_id": "beanie"}),
+        )
+        logger.debug("Successfully pinged MongoDB server")
+
+        indexes_current = stored_state is not None and stored_state.get("hash") == index_hash
+        await init_beanie(
+            database=database,
+            document_models=__beanie_models__,
+            skip_indexes=indexes_current,
+            **BEANIE_INIT_OPTIONS,
+        )
+        if not indexes_current:
+            await index_state.replace_one({"_id": "beanie"}, {"_id": "beanie", "hash": index_hash}, upsert=True)
+        logger.info("Beanie initialization completed successfully")
+        _beanie_initialized = True
+
+
+def beanie_ready() -> bool:
+    """Cheap synchronous check so hot paths can skip awaiting initialization."""
+    return _beanie_initialized
+
 
 async def ensure_beanie_initialized() -> bool:
     """Ensure Beanie is initialized before any database operations"""
-    global _beanie_initialized
     if not _beanie_initialized:
-        print("Initializing Beanie...")
         try:
-            client = create_motor_client(settings.AZURE_COSMOS_CONNECTION_STRING)
-
-            # Test the connection
-            await client.admin.command('ping')
-            print("Successfully pinged MongoDB server")
-
-            database = client[settings.AZURE_COSMOS_DATABASE_NAME]
-            print(f"Connected to database: {settings.AZURE_COSMOS_DATABASE_NAME}")
-
-            await init_beanie(
-                database=database,
-                document_models=__beanie_models__,
-            )
-            print("Beanie initialization completed successfully")
-            _beanie_initialized = True
-            return True
+            await _initialize_database()
         except Exception as e:
             # Log the error but don't crash the application. /db-status will report the problem.
-            import traceback
-            print(f"Beanie initialization failed: {e}")
-            traceback.print_exc()
+            logger.exception("Beanie initialization failed: %s", e)
             return False
     return True
 
@@ -208,6 +260,7 @@ class BeanieInitMiddleware(BaseHTTPMiddleware):
         return await call_next(request)
 
 app = FastAPI(
+    default_response_class=ORJSONResponse,
     description="The Globe API",
     version="3.0.0",
     title="The Globe API",
@@ -228,6 +281,13 @@ app.add_middleware(
 app.add_middleware(BeanieInitMiddleware)
 
 if settings.APPLICATIONINSIGHTS_CONNECTION_STRING:
+    # Only pay the OpenTelemetry import cost when tracing is actually configured
+    from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
     exporter = AzureMonitorTraceExporter.from_connection_string(
         settings.APPLICATIONINSIGHTS_CONNECTION_STRING
     )
@@ -235,81 +295,90 @@ if settings.APPLICATIONINSIGHTS_CONNECTION_STRING:
     tracerProvider = TracerProvider(
         resource=Resource({SERVICE_NAME: role_name})
     )
-    tracerProvider.add_span_processor(BatchSpanProcessor(exporter))
+    # Coalesce spans into fewer, larger exports than the library defaults
+    # (2048 queue / 512 batch / 5 s). Standard OTEL_BSP_* env vars still win.
+    tracerProvider.add_span_processor(BatchSpanProcessor(
+        exporter,
+        max_queue_size=int(os.environ.get("OTEL_BSP_MAX_QUEUE_SIZE", 8192)),
+        max_export_batch_size=int(os.environ.get("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", 1024)),
+        schedule_delay_millis=int(os.environ.get("OTEL_BSP_SCHEDULE_DELAY", 15000)),
+        export_timeout_millis=int(os.environ.get("OTEL_BSP_EXPORT_TIMEOUT", 10000)),
+    ))
 
     FastAPIInstrumentor.instrument_app(app, tracer_provider=tracerProvider)
 
 
-from . import routes  # NOQA
+# Last successful /db-status payload and when it was produced (monotonic seconds)
+_db_status_cache: tuple = (0.0, {})
+DB_STATUS_CACHE_TTL_SECONDS = 10
+DB_STATUS_PROBE_TIMEOUT_MS = 2000
+DB_STATUS_TIMEOUT_SECONDS = 5
+
 
 @app.get("/db-status")
 async def db_status():
     """Check database connection status"""
-    try:
-        print(f"Testing database connection...")
-        print(f"Connection string set: {bool(settings.AZURE_COSMOS_CONNECTION_STRING)}")
-        print(f"Database name: {settings.AZURE_COSMOS_DATABASE_NAME}")
-
-        client = create_motor_client(settings.AZURE_COSMOS_CONNECTION_STRING)
+    global _db_status_cache
+    cached_at, cached = _db_status_cache
+    if cached and time.monotonic() - cached_at < DB_STATUS_CACHE_TTL_SECONDS:
+        return cached
 
-        # Test connection with ping
-        result = await client.admin.command('ping')
-        print(f"Ping result: {result}")
-
-        # Try to list databases
-        db_list = await client.list_database_names()
-        print(f"Available databases: {db_list}")
+    try:
+        logger.debug("Testing database connection...")
+        logger.debug("Connection string set: %s", bool(settings.AZURE_COSMOS_CONNECTION_STRING))
+        logger.debug("Database name: %s", settings.AZURE_COSMOS_DATABASE_NAME)
 
-        # Check if our database exists
+        client = get_mongo_client()
         db = client[settings.AZURE_COSMOS_DATABASE_NAME]
-        collections = await db.list_collection_names()
-        print(f"Collections in {settings.AZURE_COSMOS_DATABASE_NAME}: {collections}")
 
-        return {
+        # Ping, list databases and list our collections in parallel. Bound the
+        # whole probe so a DB brownout can't hold the request for the client's
+        # full server-selection timeout.
+        result, db_list, collections = await asyncio.wait_for(
+            asyncio.gather(
+                client.admin.command('ping', maxTimeMS=DB_STATUS_PROBE_TIMEOUT_MS),
+                client.list_database_names(),
+                db.list_collection_names(),
+            ),
+            timeout=DB_STATUS_TIMEOUT_SECONDS,
+        )
+        logger.debug("Ping result: %s", result)
+        logger.debug("Available databases: %s", db_list)
+        logger.debug("Collections in %s: %s", settings.AZURE_COSMOS_DATABASE_NAME, collections)
+
+        status = {
             "status": "connected",
             "ping": result,
             "databases": db_list,
             "collections": collections,
         }
+        _db_status_cache = (time.monotonic(), status)
+        return status
+    except asyncio.TimeoutError:
+        logger.warning("Database status check timed out after %ss", DB_STATUS_TIMEOUT_SECONDS)
+        return {
+            "status": "error",
+            "error": f"database status check timed out after {DB_STATUS_TIMEOUT_SECONDS}s",
+            "type": "TimeoutError",
+        }
     except Exception as e:
-        print(f"Database connection error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Database connection error: %s", e)
         return {"status": "error", "error": str(e), "type": type(e).__name__}
 
 @app.on_event("startup")
 async def startup_event():
-    print(f"Starting database initialization...")
-    print(f"Connection string set: {bool(settings.AZURE_COSMOS_CONNECTION_STRING)}")
-    print(f"Database name: {settings.AZURE_COSMOS_DATABASE_NAME}")
-    
-    try:
-        # First, run a quick synchronous connection check. In many cases
-        # pymongo.server_info() will provide a clearer success/failure than
-        # an async Motor ping and avoids spurious connection closed errors.
-        try:
-            info = test_sync_connection(settings.AZURE_COSMOS_CONNECTION_STRING)
-            print("Synchronous server_info succeeded:", info.get('version'))
-        except Exception as e:
-            print(f"Synchronous connectivity test failed: {e}")
-            raise
-
-        client = create_motor_client(settings.AZURE_COSMOS_CONNECTION_STRING)
-
-        # Test the connection via Motor
-        await client.admin.command('ping')
-        print("Successfully pinged MongoDB server")
-
-        database = client[settings.AZURE_COSMOS_DATABASE_NAME]
-        print(f"Connected to database: {settings.AZURE_COSMOS_DATABASE_NAME}")
+    logger.debug("Starting database initialization...")
+    logger.debug("Connection string set: %s", bool(settings.AZURE_COSMOS_CONNECTION_STRING))
+    logger.debug("Database name: %s", settings.AZURE_COSMOS_DATABASE_NAME)
 
-        await init_beanie(
-            database=database,
-            document_models=__beanie_models__,
-        )
-        print("Beanie initialization completed successfully")
+    try:
+        await _initialize_database()
     except Exception as e:
         # Prevent startup from crashing when DB is unreachable; log and continue.
-        import traceback
-        print(f"Database initialization failed during startup: {e}")
-        traceback.print_exc()
+        logger.exception("Database initialization failed during startup: %s", e)
+
+
+# Register routes last, once the app, middleware, tracing and lifecycle hooks
+# are fully configured. Routes must be registered at import time (not in a
+# startup hook) because the Azure Functions adapter does not run the lifespan.
+from . import routes  # NOQA
@@ -1,41 +1,30 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 from typing import Optional
 
+from azure.core.exceptions import ResourceNotFoundError
 from azure.identity import DefaultAzureCredential
 from azure.keyvault.secrets import SecretClient
 from beanie import Document, PydanticObjectId
-from pydantic import BaseModel, BaseSettings
+from pydantic import BaseModel, BaseSettings, Field, validator
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
 
 def keyvault_name_as_attr(name: str) -> str:
     return name.replace("-", "_").upper()
 
 
-class Settings(BaseSettings):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        # Try to load from Key Vault first if endpoint is available, but fall back to env vars
-        if self.AZURE_KEY_VAULT_ENDPOINT:
-            try:
-                credential = DefaultAzureCredential()
-                keyvault_client = SecretClient(self.AZURE_KEY_VAULT_ENDPOINT, credential)
-                secrets_loaded = 0
-                for secret in keyvault_client.list_properties_of_secrets():
-                    if secret.name:
-                        value = keyvault_client.get_secret(secret.name).value
-                        if value:  # Only set if value is not empty
-                            setattr(self, keyvault_name_as_attr(secret.name), value)
-                            secrets_loaded += 1
-                if secrets_loaded > 0:
-                    print(f"Successfully loaded {secrets_loaded} secrets from Key Vault")
-                else:
-                    print("Key Vault accessible but no secrets found, using environment variables")
-            except Exception as e:
-                print(f"Key Vault access failed: {e}, using environment variables")
-        else:
-            print("Key Vault endpoint not configured, using environment variables")
+def normalize_slug(value: str) -> str:
+    """Canonical slug form, so the same slug in different casing compares equal."""
+    return value.strip().lower()
 
+
+class Settings(BaseSettings):
     AZURE_COSMOS_CONNECTION_STRING: str = ""
     AZURE_COSMOS_DATABASE_NAME: str = "Blog"
     AZURE_KEY_VAULT_ENDPOINT: Optional[str] = None
@@ -47,6 +36,67 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
 
 
+# Shared Key Vault client (and its credential/token cache) for the process
+_keyvault_client: Optional[SecretClient] = None
+
+
+def _get_keyvault_client(endpoint: str) -> SecretClient:
+    global _keyvault_client
+    if _keyvault_client is None:
+        _keyvault_client = SecretClient(endpoint, DefaultAzureCredential())
+    return _keyvault_client
+
+
+# Key Vault secrets that map onto Settings fields (see keyvault_name_as_attr).
+# Fetching these by name avoids listing the vault and pulling unrelated secrets.
+REQUIRED_SECRETS = (
+    "AZURE-COSMOS-CONNECTION-STRING",
+    "AZURE-COSMOS-DATABASE-NAME",
+    "APPLICATIONINSIGHTS-CONNECTION-STRING",
+    "APPLICATIONINSIGHTS-ROLENAME",
+)
+
+
+def _get_secret_value(keyvault_client: SecretClient, name: str) -> Optional[str]:
+    try:
+        return keyvault_client.get_secret(name).value
+    except ResourceNotFoundError:
+        return None
+
+
+def _load_keyvault_secrets(settings: Settings) -> None:
+    """Overlay Key Vault secrets onto settings, fetching them in parallel."""
+    keyvault_client = _get_keyvault_client(settings.AZURE_KEY_VAULT_ENDPOINT)
+    with ThreadPoolExecutor(max_workers=len(REQUIRED_SECRETS)) as executor:
+        values = list(executor.map(lambda name: _get_secret_value(keyvault_client, name), REQUIRED_SECRETS))
+
+    secrets_loaded = 0
+    for name, value in zip(REQUIRED_SECRETS, values):
+        if value:  # Only set if value is not empty
+            setattr(settings, keyvault_name_as_attr(name), value)
+            secrets_loaded += 1
+    if secrets_loaded > 0:
+        logger.info("Successfully loaded %d secrets from Key Vault", secrets_loaded)
+    else:
+        logger.info("Key Vault accessible but no secrets found, using environment variables")
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide settings, loading Key Vault secrets only once."""
+    settings = Settings()
+
+    # Try to load from Key Vault first if endpoint is available, but fall back to env vars
+    if settings.AZURE_KEY_VAULT_ENDPOINT:
+        try:
+            _load_keyvault_secrets(settings)
+        except Exception as e:
+            logger.warning("Key Vault access failed: %s, using environment variables", e)
+    else:
+        logger.info("Key Vault endpoint not configured, using environment variables")
+    return settings
+
+
 class Category(Document):
     name: str
     description: Optional[str] = None
@@ -54,12 +104,19 @@ class Category(Document):
     createdDate: Optional[datetime] = None
     updatedDate: Optional[datetime] = None
 
+    _normalize_slug = validator("slug", allow_reuse=True)(normalize_slug)
+
+    class Settings:
+        keep_nulls = False  # don't store unset optional fields as explicit nulls
+
 
 class CreateUpdateCategory(BaseModel):
     name: str
     description: Optional[str] = None
     slug: str
 
+    _normalize_slug = validator("slug", allow_reuse=True)(normalize_slug)
+
 
 class BlogPost(Document):
     title: str
@@ -75,6 +132,32 @@ class BlogPost(Document):
     updatedDate: Optional[datetime] = None
     imageUrl: Optional[str] = None  # Featured image URL
 
+    _normalize_slug = validator("slug", allow_reuse=True)(normalize_slug)
+
+    class Settings:
+        keep_nulls = False
+        # Back the /posts filters (published, category) and their newest-first
+        # ordering; the _id tail keeps sort + skip/limit a pure index scan.
+        indexes = [
+            IndexModel([("publishedDate", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("published", ASCENDING), ("publishedDate", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("categoryId", ASCENDING), ("publishedDate", DESCENDING), ("_id", DESCENDING)]),
+        ]
+
+
+class BlogPostSummary(BaseModel):
+    """Projection of BlogPost without the (potentially large) content body."""
+    id: PydanticObjectId = Field(alias="_id")
+    title: str
+    excerpt: Optional[str] = None
+    author: str
+    categoryId: Optional[PydanticObjectId] = None
+    tags: Optional[list[str]] = []
+    slug: str
+    published: bool = False
+    publishedDate: Optional[datetime] = None
+    imageUrl: Optional[str] = None
+
 
 class CreateUpdateBlogPost(BaseModel):
     title: str
@@ -88,6 +171,8 @@ class CreateUpdateBlogPost(BaseModel):
     publishedDate: Optional[datetime] = None
     imageUrl: Optional[str] = None
 
+    _normalize_slug = validator("slug", allow_reuse=True)(normalize_slug)
+
 
 class Comment(Document):
     postId: PydanticObjectId
@@ -98,6 +183,13 @@ class Comment(Document):
     createdDate: Optional[datetime] = None
     updatedDate: Optional[datetime] = None
 
+    class Settings:
+        keep_nulls = False
+        # Back /posts/{post_id}/comments; the _id tail keeps sort-after-filter an index scan
+        indexes = [
+            IndexModel([("postId", ASCENDING), ("approved", ASCENDING), ("_id", DESCENDING)]),
+        ]
+
 
 class CreateUpdateComment(BaseModel):
     author: str
@@ -1,22 +1,86 @@
+import ast
+import re
 from datetime import datetime, timezone
 from http import HTTPStatus
-from typing import List, Optional
+from typing import List, Optional, Union
 from urllib.parse import urljoin
 
+import orjson
 from beanie import PydanticObjectId
+from bson import ObjectId
 from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pymongo import ReturnDocument
 from starlette.requests import Request
 
-from .app import app
-from .models import (BlogPost, Category, Comment, CreateUpdateBlogPost,
-                     CreateUpdateCategory, CreateUpdateComment)
+from .app import app, beanie_ready, ensure_beanie_initialized
+from .models import (BlogPost, BlogPostSummary, Category, Comment,
+                     CreateUpdateBlogPost, CreateUpdateCategory,
+                     CreateUpdateComment)
 
 
-# Import the chat agent function - lazy import to avoid initialization issues
-# import sys
-# import os
-# sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chat'))
-# from agent import chat_with_agent
+# Matches an embedded error dict such as "{'code': 'rate_limit_exceeded', 'message': '...'}"
+_ERR_DICT_RE = re.compile(r"\{[^{}]*\}")
+# Matches the suggested wait in messages like "Try again in 20 seconds"
+_RETRY_SECS_RE = re.compile(r"(\d+)\s*second")
+
+# The chat agent is imported lazily on first use to avoid initialization issues during app startup
+_chat_with_agent = None
+
+
+def _get_chat_with_agent():
+    global _chat_with_agent
+    if _chat_with_agent is None:
+        # chat/ sits next to blog/ on the import root, so it resolves as a
+        # namespace package without touching sys.path
+        from chat.agent import chat_with_agent, configure
+        configure()
+        _chat_with_agent = chat_with_agent
+    return _chat_with_agent
+
+
+@app.on_event("shutdown")
+async def close_chat_clients():
+    # Only close what was actually created; don't import the chat module just to shut it down
+    if _chat_with_agent is not None:
+        from chat.agent import close_clients
+        await close_clients()
+
+
+async def _find_one_and_set(model, query: dict, update_data: dict):
+    """Apply a $set to the matching document and return it in one round-trip.
+
+    Returns None when nothing matches, so callers can map that to a 404
+    without fetching the document first.
+    """
+    raw = await model.get_pymongo_collection().find_one_and_update(
+        query, {"$set": update_data}, return_document=ReturnDocument.AFTER
+    )
+    return model.parse_obj(raw) if raw else None
+
+
+def _orjson_default(value):
+    """Encode the BSON types the models carry; anything else is a bug, not a string."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+async def _stream_json_array(first_doc, docs):
+    """Serialize query results as a JSON array one document at a time.
+
+    Keeps memory at one document regardless of page size instead of
+    materializing the whole result list before encoding it. The caller
+    fetches first_doc (None for an empty result) before the response starts,
+    so query errors still surface as a normal error response.
+    """
+    yield b"["
+    if first_doc is not None:
+        yield orjson.dumps(first_doc.dict(), default=_orjson_default)
+        async for doc in docs:
+            yield b","
+            yield orjson.dumps(doc.dict(), default=_orjson_default)
+    yield b"]"
 
 
 # Health check endpoint (no database dependency)
@@ -32,12 +96,11 @@ async def health_check():
 async def test_beanie():
     """Test Beanie initialization"""
     try:
-        from .app import ensure_beanie_initialized
-        await ensure_beanie_initialized()
-        
-        from .models import BlogPost
-        # Try to count documents
-        count = await BlogPost.count()
+        if not beanie_ready():
+            await ensure_beanie_initialized()
+
+        # Metadata-based count: O(1) and good enough for a probe
+        count = await BlogPost.get_pymongo_collection().estimated_document_count()
         return {"status": "success", "blog_posts_count": count}
     except Exception as e:
         import traceback
@@ -66,7 +129,7 @@ async def create_category(body: CreateUpdateCategory, request: Request, response
     """
     Create a new category
     """
-    category = await Category(**body.dict(), createdDate=datetime.now(timezone.utc)).save()
+    category = await Category(**body.dict(exclude_none=True, exclude_unset=True), createdDate=datetime.now(timezone.utc)).save()
     response.headers["Location"] = urljoin(str(request.base_url), f"categories/{category.id}")
     return category
 
@@ -89,12 +152,12 @@ async def update_category(
     """
     Updates a category by unique identifier
     """
-    category = await Category.get(document_id=category_id)
+    update_data = body.dict(exclude_unset=True)
+    update_data["updatedDate"] = datetime.now(timezone.utc)
+    category = await _find_one_and_set(Category, {"_id": category_id}, update_data)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
-    await category.update({"$set": body.dict(exclude_unset=True)})
-    category.updatedDate = datetime.now(timezone.utc)
-    return await category.save()
+    return category
 
 
 @app.delete("/categories/{category_id}", response_class=Response, status_code=204)
@@ -102,20 +165,26 @@ async def delete_category(category_id: PydanticObjectId) -> None:
     """
     Deletes a category by unique identifier
     """
-    category = await Category.get(document_id=category_id)
-    if not category:
+    result = await Category.find_one(Category.id == category_id).delete()
+    if not result.deleted_count:
         raise HTTPException(status_code=404, detail="Category not found")
-    await category.delete()
 
 
 # Blog post routes
-@app.get("/posts", response_model=List[BlogPost], response_model_by_alias=False)
+# The body is streamed, so response_model validation doesn't apply; the schema is
+# declared through responses to keep the OpenAPI entry accurate
+@app.get(
+    "/posts",
+    response_class=StreamingResponse,
+    responses={200: {"model": List[Union[BlogPost, BlogPostSummary]]}},
+)
 async def get_posts(
     published: Optional[bool] = None,
     category_id: Optional[PydanticObjectId] = None,
     top: Optional[int] = None,
-    skip: Optional[int] = None
-) -> List[BlogPost]:
+    skip: Optional[int] = None,
+    summary: bool = False
+) -> StreamingResponse:
     """
     Get all blog posts
 
@@ -124,20 +193,28 @@ async def get_posts(
     - **category_id**: Filter by category
     - **top**: Number of posts to return
     - **skip**: Number of posts to skip
+    - **summary**: Omit post content from the results
     """
-    from .app import ensure_beanie_initialized
-    await ensure_beanie_initialized()
-    
-    query = BlogPost.all()
+    if not beanie_ready():
+        await ensure_beanie_initialized()
 
+    # Build one flat filter so Mongo sees a single predicate document
+    filters = {}
     if published is not None:
-        query = query.find(BlogPost.published == published)
-
+        filters["published"] = published
     if category_id:
-        query = query.find(BlogPost.categoryId == category_id)
+        filters["categoryId"] = category_id
 
-    query = query.skip(skip).limit(top)
-    return await query.to_list()
+    query = BlogPost.find(filters).sort(-BlogPost.publishedDate, -BlogPost.id).skip(skip).limit(top)
+    if summary:
+        # Let Mongo drop the content body server-side for list views
+        query = query.project(BlogPostSummary)
+    # Run the query and await the first document before any headers go out, so
+    # a Mongo/Cosmos error (429, timeout) takes the normal error path instead
+    # of truncating a 200 response
+    docs = aiter(query)
+    first_doc = await anext(docs, None)
+    return StreamingResponse(_stream_json_array(first_doc, docs), media_type="application/json")
 
 
 @app.post("/posts", response_model=BlogPost, response_model_by_alias=False, status_code=201)
@@ -145,11 +222,13 @@ async def create_post(body: CreateUpdateBlogPost, request: Request, response: Re
     """
     Create a new blog post
     """
-    post_data = body.dict()
+    # One timestamp per request so createdDate and publishedDate agree
+    now = datetime.now(timezone.utc)
+    post_data = body.dict(exclude_none=True, exclude_unset=True)
     if body.published and not body.publishedDate:
-        post_data["publishedDate"] = datetime.now(timezone.utc)
+        post_data["publishedDate"] = now
 
-    post = await BlogPost(**post_data, createdDate=datetime.now(timezone.utc)).save()
+    post = await BlogPost(**post_data, createdDate=now).save()
     response.headers["Location"] = urljoin(str(request.base_url), f"posts/{post.id}")
     return post
 
@@ -176,13 +255,14 @@ async def update_post(
     if not post:
         raise HTTPException(status_code=404, detail="Blog post not found")
 
+    now = datetime.now(timezone.utc)
     update_data = body.dict(exclude_unset=True)
     if body.published and not post.publishedDate:
-        update_data["publishedDate"] = datetime.now(timezone.utc)
+        update_data["publishedDate"] = now
 
-    await post.update({"$set": update_data})
-    post.updatedDate = datetime.now(timezone.utc)
-    return await post.save()
+    update_data["updatedDate"] = now
+    await post.set(update_data)
+    return post
 
 
 @app.delete("/posts/{post_id}", response_class=Response, status_code=204)
@@ -190,10 +270,9 @@ async def delete_post(post_id: PydanticObjectId) -> None:
     """
     Deletes a blog post by unique identifier
     """
-    post = await BlogPost.get(document_id=post_id)
-    if not post:
+    result = await BlogPost.find_one(BlogPost.id == post_id).delete()
+    if not result.deleted_count:
         raise HTTPException(status_code=404, detail="Blog post not found")
-    await post.delete()
 
 
 # Comment routes
@@ -212,12 +291,11 @@ async def get_post_comments(
     - **top**: Number of comments to return
     - **skip**: Number of comments to skip
     """
-    query = Comment.find(Comment.postId == post_id)
-
+    filters = {"postId": post_id}
     if approved is not None:
-        query = query.find(Comment.approved == approved)
+        filters["approved"] = approved
 
-    query = query.skip(skip).limit(top)
+    query = Comment.find(filters).sort(-Comment.id).skip(skip).limit(top)
     return await query.to_list()
 
 
@@ -233,7 +311,7 @@ async def create_comment(
     """
     comment = await Comment(
         postId=post_id,
-        **body.dict(),
+        **body.dict(exclude_none=True, exclude_unset=True),
     createdDate=datetime.now(timezone.utc)
     ).save()
     response.headers["Location"] = urljoin(str(request.base_url), f"posts/{post_id}/comments/{comment.id}")
@@ -249,16 +327,14 @@ async def update_comment(
     """
     Updates a comment by unique identifier
     """
-    comment = await Comment.find_one(
-        Comment.id == comment_id,
-        Comment.postId == post_id
-    )
+    update_data = body.dict(exclude_unset=True)
+    update_data["updatedDate"] = datetime.now(timezone.utc)
+    # postId stays in the filter: it is the ownership check for the URL's post.
+    # The _id equality already selects the _id index, so it costs nothing extra.
+    comment = await _find_one_and_set(Comment, {"_id": comment_id, "postId": post_id}, update_data)
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
-
-    await comment.update({"$set": body.dict(exclude_unset=True)})
-    comment.updatedDate = datetime.now(timezone.utc)
-    return await comment.save()
+    return comment
 
 
 @app.delete("/posts/{post_id}/comments/{comment_id}", response_class=Response, status_code=204)
@@ -269,13 +345,13 @@ async def delete_comment(
     """
     Deletes a comment by unique identifier
     """
-    comment = await Comment.find_one(
+    # As in update_comment, postId is the ownership check, not a redundant predicate
+    result = await Comment.find_one(
         Comment.id == comment_id,
         Comment.postId == post_id
-    )
-    if not comment:
+    ).delete()
+    if not result.deleted_count:
         raise HTTPException(status_code=404, detail="Comment not found")
-    await comment.delete()
 
 
 # Chat endpoint
@@ -297,24 +373,16 @@ async def chat_endpoint(request: ChatRequest):
     Chat with the AI agent with conversation history support
     """
     try:
-        # Lazy import to avoid initialization issues during app startup
-        import sys
-        import os
-        sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chat'))
-        from agent import chat_with_agent
-        
+        chat_with_agent = _get_chat_with_agent()
         result = await chat_with_agent(request.message, request.conversation_history, request.conversation_id)
         return ChatResponse(response=result["response"], conversation_id=result["conversation_id"])
     except Exception as e:
-        import ast
-        import re
-
         # Try to parse an embedded dict in the exception text (e.g. "Agent run failed: {'code': 'rate_limit_exceeded', 'message': '...'}")
         text = str(e)
         parsed = None
         try:
             # Find the first {...} substring and parse it as a Python literal
-            m = re.search(r"\{.*\}", text)
+            m = _ERR_DICT_RE.search(text)
             if m:
                 parsed = ast.literal_eval(m.group(0))
         except Exception:
@@ -324,7 +392,7 @@ async def chat_endpoint(request: ChatRequest):
         if isinstance(parsed, dict) and parsed.get('code') == 'rate_limit_exceeded':
             # Try to extract suggested seconds from message, fallback to 60
             msg_text = str(parsed.get('message', ''))
-            sec_match = re.search(r"(\d+)\s*second", msg_text)
+            sec_match = _RETRY_SECS_RE.search(msg_text)
             retry_after = int(sec_match.group(1)) if sec_match else 60
             raise HTTPException(status_code=429, detail=msg_text or f"Rate limit exceeded. Try again in {retry_after} seconds.", headers={"Retry-After": str(retry_after)})
 
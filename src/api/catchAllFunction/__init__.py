@@ -1,8 +1,10 @@
 import azure.functions as func
-from azure.functions._http_asgi import AsgiResponse, AsgiRequest
+from azure.functions._http_asgi import AsgiResponse
 import sys
 import os
 import logging
+from typing import Optional
+from urllib.parse import unquote_to_bytes, urlsplit
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +16,10 @@ import blog.app as blog_app_module
 
 initialized = False
 
+# Paths that must work without a database (health probe, docs, static assets)
+_NO_INIT_PATHS = frozenset({'/', '/health'})
+_NO_INIT_PREFIXES = ('/docs', '/openapi', '/static')
+
 async def ensure_init():
     global initialized
     if initialized:
@@ -30,13 +36,46 @@ async def ensure_init():
         logger.exception("Blog API initialization failed")
         raise
 
+_ASGI_INFO = {"version": "3.0", "spec_version": "2.3"}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def _build_scope(req: func.HttpRequest, context: Optional[func.Context] = None) -> dict:
+    """Build the ASGI HTTP scope directly from the Functions request.
+
+    Matches AsgiRequest(req, context).to_asgi_http_scope() for what the app uses,
+    without AsgiRequest's WSGI environ setup. Unlike AsgiRequest, raw_path keeps
+    the original percent-encoded bytes, as the ASGI spec describes.
+    """
+    url = urlsplit(req.url)
+    path = unquote_to_bytes(url.path).decode("utf-8")
+    port = url.port or _DEFAULT_PORTS.get(url.scheme)
+    return {
+        "type": "http",
+        "asgi": _ASGI_INFO,
+        "http_version": "1.1",
+        "method": req.method,
+        "scheme": url.scheme,
+        "path": path,
+        "raw_path": url.path.encode("ascii"),
+        "query_string": url.query.encode("utf-8"),
+        "root_path": "",
+        "headers": [(k.lower().encode("utf-8"), v.encode("utf-8")) for k, v in req.headers.items()],
+        "server": (url.hostname, port) if url.hostname else None,
+        "client": None,
+        "azure_functions.function_directory": getattr(context, "function_directory", None),
+        "azure_functions.function_name": getattr(context, "function_name", None),
+        "azure_functions.invocation_id": getattr(context, "invocation_id", None),
+        "azure_functions.thread_local_storage": getattr(context, "thread_local_storage", None),
+        "azure_functions.trace_context": getattr(context, "trace_context", None),
+        "azure_functions.retry_context": getattr(context, "retry_context", None),
+    }
+
 async def handle_asgi_request(req: func.HttpRequest, context: func.Context) -> func.HttpResponse:
-    asgi_request = AsgiRequest(req, context)
-    scope = asgi_request.to_asgi_http_scope()
+    scope = _build_scope(req, context)
     asgi_response = await AsgiResponse.from_app(blog_app_module.app, scope, req.get_body())
     return asgi_response.to_func_response()
 
-async def main(req: func.HttpRequest, context: func.Context) -> func.HttpResponse:
+def _needs_init(req: func.HttpRequest) -> bool:
     # Determine the request path from route params or URL
     route_param = req.route_params.get('route') if hasattr(req, 'route_params') else None
     path = route_param or '/'
@@ -44,9 +83,11 @@ async def main(req: func.HttpRequest, context: func.Context) -> func.HttpRespons
         path = f'/{path}'
 
     # Allow health and docs to work without forcing DB init
-    skip_init = path == '/health' or path == '/' or path.startswith('/docs') or path.startswith('/openapi') or path.startswith('/static')
+    return path not in _NO_INIT_PATHS and not path.startswith(_NO_INIT_PREFIXES)
 
-    if not skip_init:
+async def main(req: func.HttpRequest, context: func.Context) -> func.HttpResponse:
+    # Once initialized, skip the per-request path inspection entirely
+    if not initialized and _needs_init(req):
         try:
             await ensure_init()
         except Exception:
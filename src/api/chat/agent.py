@@ -1,108 +1,255 @@
 """Chat agent helper that talks to Azure AI Projects (Assistants) and persists the created
-agent id into Key Vault. This module is safe to import (no top-level network calls).
+agent id into Key Vault. This module is safe to import (no top-level network calls, .env loading
+or logging setup; call configure() once from the entrypoint for that).
 
 It exposes a single async function: chat_with_agent(user_message, conversation_history=None, conversation_id=None)
 which will create/ensure an agent, create or reuse a thread, run the agent, and return the assistant's reply
-and the conversation/thread id.
+and the conversation/thread id. All SDK calls use the async (aio) clients so requests never block the event loop.
 """
 
 from __future__ import annotations
 
 import os
 import asyncio
-from typing import List, Dict, Optional
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
 
 from dotenv import load_dotenv
 import logging
 
 try:
-    from azure.ai.projects import AIProjectClient
-    from azure.identity import DefaultAzureCredential, ClientSecretCredential
-    from azure.keyvault.secrets import SecretClient
+    import aiohttp
+    from azure.ai.projects.aio import AIProjectClient
+    from azure.core.pipeline.transport import AioHttpTransport
+    from azure.identity.aio import DefaultAzureCredential, ClientSecretCredential
+    from azure.keyvault.secrets.aio import SecretClient
 except Exception:  # pragma: no cover - allow import-time failures in environments without Azure SDK
+    aiohttp = None
+    AioHttpTransport = None
     AIProjectClient = None
     DefaultAzureCredential = None
     ClientSecretCredential = None
     SecretClient = None
 
 
-# Load local .env for development if present
-load_dotenv()
-
-# Module logger
+# Module logger. As a library module it only installs a NullHandler; output is left to the
+# application's logging config (or configure() below for local runs).
 logger = logging.getLogger("theglobe.chat")
-if not logger.handlers:
-    # configure a simple handler if the app hasn't configured logging yet
-    handler = logging.StreamHandler()
+logger.addHandler(logging.NullHandler())
+
+_configured = False
+
+
+def configure() -> None:
+    """One-time setup for the chat module: load a local .env and apply THEGLOBE_CHAT_LOG_* settings."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    # Load local .env for development if present; already-set variables are not overridden
+    load_dotenv()
+
     formatter = logging.Formatter("%(asctime)s %(levelname)s [theglobe.chat] %(message)s")
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-# Default to DEBUG locally so we can see message previews; override with THEGLOBE_CHAT_LOG_LEVEL env var
-level_name = os.getenv("THEGLOBE_CHAT_LOG_LEVEL", "DEBUG")
-try:
-    logger.setLevel(level_name)
-except Exception:
-    logger.setLevel("DEBUG")
-# Also add a file handler (helpful for reading logs from this environment)
-log_path = os.getenv("THEGLOBE_CHAT_LOG_PATH", "/tmp/theglobe_chat.log")
-try:
-    file_handler = logging.FileHandler(log_path)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-except Exception:
-    # best effort — don't fail import if file handler can't be created
-    logger.debug("Unable to create file handler for %s", log_path)
+    if not logging.getLogger().handlers:
+        # the host hasn't configured logging; add a simple console handler
+        handler = logging.StreamHandler()
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    # Let the application's logging config decide the level unless THEGLOBE_CHAT_LOG_LEVEL overrides it
+    level_name = os.getenv("THEGLOBE_CHAT_LOG_LEVEL")
+    if level_name:
+        try:
+            logger.setLevel(level_name.upper())
+        except ValueError:
+            logger.warning("Ignoring invalid THEGLOBE_CHAT_LOG_LEVEL=%s", level_name)
+    # Optional file handler, only when THEGLOBE_CHAT_LOG_PATH is set (e.g. /tmp/theglobe_chat.log locally)
+    log_path = os.getenv("THEGLOBE_CHAT_LOG_PATH")
+    if log_path:
+        try:
+            file_handler = logging.FileHandler(log_path)
+            file_handler.setFormatter(formatter)
+            logger.addHandler(file_handler)
+        except Exception:
+            # best effort — don't fail if file handler can't be created
+            logger.debug("Unable to create file handler for %s", log_path)
+
+
+# Refresh cached tokens this many seconds before they expire
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+
+class _CachingCredential:
+    """TokenCredential wrapper that hands out a cached AccessToken per scope until shortly before
+    it expires, so DefaultAzureCredential doesn't walk its chain (az cli / IMDS) on every call.
 
+    When tenant_id is given, every token is requested for that tenant (the inner credential must
+    allow it, see _build_credential)."""
 
-def _build_credential():
-    """Build a credential: prefer client secret if provided, otherwise DefaultAzureCredential."""
+    def __init__(self, inner, refresh_margin: int = TOKEN_REFRESH_MARGIN_SECONDS, tenant_id: Optional[str] = None):
+        self._inner = inner
+        self._tenant_id = tenant_id
+        self._refresh_margin = refresh_margin
+        self._cache: Dict[str, object] = {}
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, key: str):
+        token = self._cache.get(key)
+        if token is not None and time.time() < token.expires_on - self._refresh_margin:
+            return token
+        return None
+
+    async def get_token(self, *scopes, **kwargs):
+        # Claims challenges and tenant overrides must always go to the real credential
+        if kwargs.get("claims") or kwargs.get("tenant_id"):
+            return await self._inner.get_token(*scopes, **kwargs)
+        if self._tenant_id:
+            kwargs["tenant_id"] = self._tenant_id
+        key = " ".join(scopes)
+        token = self._fresh(key)
+        if token is not None:
+            return token
+        async with self._lock:
+            token = self._fresh(key)
+            if token is None:
+                token = await self._inner.get_token(*scopes, **kwargs)
+                self._cache[key] = token
+        return token
+
+    async def close(self) -> None:
+        await self._inner.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+
+def _build_credential(tenant_id: Optional[str] = None):
+    """Build a credential: prefer client secret if provided, otherwise DefaultAzureCredential.
+
+    tenant_id selects a tenant other than the configured/home one.
+    """
     client_id = os.getenv("AZURE_CLIENT_ID")
     client_secret = os.getenv("AZURE_CLIENT_SECRET")
-    tenant_id = os.getenv("AZURE_TENANT_ID")
-    if client_id and client_secret and tenant_id and ClientSecretCredential is not None:
-        return ClientSecretCredential(tenant_id=tenant_id, client_id=client_id, client_secret=client_secret)
+    secret_tenant_id = tenant_id or os.getenv("AZURE_TENANT_ID")
+    if client_id and client_secret and secret_tenant_id and ClientSecretCredential is not None:
+        return _CachingCredential(ClientSecretCredential(tenant_id=secret_tenant_id, client_id=client_id, client_secret=client_secret))
     if DefaultAzureCredential is not None:
-        return DefaultAzureCredential()
+        if tenant_id:
+            # DefaultAzureCredential has no single tenant setting; allow the tenant and have the
+            # wrapper request every token for it
+            return _CachingCredential(DefaultAzureCredential(additionally_allowed_tenants=[tenant_id]), tenant_id=tenant_id)
+        return _CachingCredential(DefaultAzureCredential())
     raise RuntimeError("No Azure credential available (azure.identity not installed)")
 
 
-def _get_kv_client() -> Optional["SecretClient"]:
-    kv_endpoint = os.getenv("AZURE_KEY_VAULT_ENDPOINT")
+# Process-wide SDK client caches so the token cache and connection pool are shared across requests.
+# Credentials and project clients are keyed by tenant and Key Vault clients by (vault URL, tenant),
+# so one process can talk to several tenants or vaults without re-authenticating; a None tenant
+# means "from the environment". The constructors don't await, so the check-and-set below can't
+# interleave on the event loop.
+_CREDENTIALS: Dict[Optional[str], object] = {}
+_KV_CLIENTS: Dict[Tuple[str, Optional[str]], "SecretClient"] = {}
+_PROJECT_CLIENTS: Dict[Optional[str], "AIProjectClient"] = {}
+# One aiohttp session shared by the SDK clients keeps TCP/TLS connections warm between requests
+_HTTP_SESSION: Optional["aiohttp.ClientSession"] = None
+
+
+def _get_transport() -> "AioHttpTransport":
+    """Return a transport over the shared session; the clients don't own (or close) the session."""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None or _HTTP_SESSION.closed:
+        # created lazily because aiohttp sessions must be built inside the running event loop
+        _HTTP_SESSION = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=100, limit_per_host=50))
+    return AioHttpTransport(session=_HTTP_SESSION, session_owner=False)
+
+
+def _get_credential(tenant_id: Optional[str] = None):
+    credential = _CREDENTIALS.get(tenant_id)
+    if credential is None:
+        credential = _CREDENTIALS[tenant_id] = _build_credential(tenant_id)
+    return credential
+
+
+def _get_kv_client(vault_url: Optional[str] = None, tenant_id: Optional[str] = None) -> Optional["SecretClient"]:
+    kv_endpoint = vault_url or os.getenv("AZURE_KEY_VAULT_ENDPOINT")
     if not kv_endpoint or SecretClient is None:
         return None
-    try:
-        return SecretClient(vault_url=kv_endpoint, credential=_build_credential())
-    except Exception:
-        return None
+    key = (kv_endpoint, tenant_id)
+    kv = _KV_CLIENTS.get(key)
+    if kv is None:
+        try:
+            kv = _KV_CLIENTS[key] = SecretClient(
+                vault_url=kv_endpoint, credential=_get_credential(tenant_id), transport=_get_transport()
+            )
+        except Exception:
+            return None
+    return kv
 
 
-def _persist_agent_id_to_kv(agent_id: str) -> None:
+async def _persist_agent_id_to_kv(agent_id: str) -> None:
     kv = _get_kv_client()
     if not kv:
         return
     try:
-        kv.set_secret("azure-agent-id", agent_id)
+        await kv.set_secret("azure-agent-id", agent_id)
     except Exception:
         # best-effort persistence
         return
 
 
-def _load_agent_id_from_kv() -> Optional[str]:
+async def _load_agent_id_from_kv() -> Optional[str]:
     kv = _get_kv_client()
     if not kv:
         return None
     try:
-        sec = kv.get_secret("azure-agent-id")
+        sec = await kv.get_secret("azure-agent-id")
         return sec.value
     except Exception:
         return None
 
 
-# In-memory cache to avoid recreating agents within the same process
+# Run status polling: start short so quick replies return promptly, back off to cap the RPC rate
+RUN_POLL_INITIAL_DELAY = 0.15
+RUN_POLL_MAX_DELAY = 2.0
+_RUN_ACTIVE_STATUSES = {"queued", "in_progress", "cancelling"}
+# Page size when reading back the thread; the reply is normally the first message on the first page
+MESSAGES_PAGE_SIZE = 20
+
+# In-memory cache to avoid recreating agents within the same process. Within the TTL the id is
+# trusted as-is, so a chat turn doesn't pay for a Key Vault read and a get_agent probe.
 _cached_agent_id: Optional[str] = None
+_cached_agent_expiry = 0.0
+AGENT_ID_TTL_SECONDS = 3600
+
+# Bounded LRU of threads this process recently created or confirmed (thread_id -> last used), so
+# consecutive turns of a conversation go straight to their thread without an existence check
+_THREAD_LRU: "OrderedDict[str, float]" = OrderedDict()
+THREAD_LRU_MAXSIZE = 10_000
+THREAD_LRU_TTL_SECONDS = 1800
+
+
+def _thread_recently_seen(thread_id: str) -> bool:
+    last_used = _THREAD_LRU.get(thread_id)
+    if last_used is None:
+        return False
+    if time.monotonic() - last_used > THREAD_LRU_TTL_SECONDS:
+        del _THREAD_LRU[thread_id]
+        return False
+    return True
 
 
-def _create_project_client() -> "AIProjectClient":
+def _remember_thread(thread_id: str) -> None:
+    _THREAD_LRU[thread_id] = time.monotonic()
+    _THREAD_LRU.move_to_end(thread_id)
+    while len(_THREAD_LRU) > THREAD_LRU_MAXSIZE:
+        _THREAD_LRU.popitem(last=False)
+
+
+def _create_project_client(tenant_id: Optional[str] = None) -> "AIProjectClient":
     if AIProjectClient is None:
         raise RuntimeError("azure.ai.projects is not available in the environment")
 
@@ -115,15 +262,15 @@ def _create_project_client() -> "AIProjectClient":
     resource_group = os.getenv("AZURE_RESOURCE_GROUP_NAME") or os.getenv("RESOURCE_GROUP")
     project_name = os.getenv("AZURE_AI_PROJECT_NAME") or os.getenv("PROJECT_NAME")
 
-    cred = _build_credential()
+    cred = _get_credential(tenant_id)
     logger.debug("Creating AIProjectClient; endpoint=%s project=%s", endpoint, project_name)
 
     try:
         # Preferred constructor when endpoint already includes projects route
-        return AIProjectClient(credential=cred, endpoint=endpoint)
+        return AIProjectClient(credential=cred, endpoint=endpoint, transport=_get_transport())
     except TypeError:
         # Older/newer SDK variants sometimes require subscription/resource group/project params
-        base_endpoint = endpoint.split("/api/projects/")[0] if "/api/projects/" in endpoint else endpoint
+        base_endpoint = endpoint.partition("/api/projects/")[0] or endpoint
         if not (subscription_id and resource_group and project_name):
             raise RuntimeError(
                 "AZURE_SUBSCRIPTION_ID/SUBSCRIPTION_ID, AZURE_RESOURCE_GROUP_NAME/RESOURCE_GROUP, and AZURE_AI_PROJECT_NAME/PROJECT_NAME must be set for AIProjectClient"
@@ -134,21 +281,49 @@ def _create_project_client() -> "AIProjectClient":
             subscription_id=subscription_id,
             resource_group_name=resource_group,
             project_name=project_name,
+            transport=_get_transport(),
         )
 
 
-def _ensure_agent(project: "AIProjectClient") -> str:
+def get_project_client_for(tenant_id: Optional[str] = None) -> "AIProjectClient":
+    """Return the cached project client for a tenant, building it on first use."""
+    project = _PROJECT_CLIENTS.get(tenant_id)
+    if project is None:
+        project = _PROJECT_CLIENTS[tenant_id] = _create_project_client(tenant_id)
+    return project
+
+
+async def close_clients() -> None:
+    """Close the cached SDK clients and the shared HTTP session (called on app shutdown)."""
+    global _HTTP_SESSION
+    for client in (*_PROJECT_CLIENTS.values(), *_KV_CLIENTS.values(), *_CREDENTIALS.values()):
+        try:
+            await client.close()
+        except Exception as e:
+            logger.debug("Error closing client: %s", e)
+    _PROJECT_CLIENTS.clear()
+    _KV_CLIENTS.clear()
+    _CREDENTIALS.clear()
+    if _HTTP_SESSION is not None:
+        await _HTTP_SESSION.close()
+        _HTTP_SESSION = None
+
+
+async def _ensure_agent(project: "AIProjectClient") -> str:
     """Return an existing agent id (env or KV) or create a new agent in the project.
 
     Creating an agent requires AZURE_MODEL to be set (model deployment name).
     """
-    global _cached_agent_id
+    global _cached_agent_id, _cached_agent_expiry
 
-    # 1) In-memory cache
+    # 1) In-memory cache; revalidate against the project only once the TTL has lapsed
+    if _cached_agent_id and time.monotonic() < _cached_agent_expiry:
+        return _cached_agent_id
     if _cached_agent_id:
         try:
-            project.agents.get_agent(_cached_agent_id)
+            await project.agents.get_agent(_cached_agent_id)
             logger.debug("Using cached agent id")
+            _cached_agent_expiry = time.monotonic() + AGENT_ID_TTL_SECONDS
             return _cached_agent_id
         except Exception as e:
             # Check if it's a 404 (agent was deleted) and clear cache
@@ -159,12 +334,13 @@ def _ensure_agent(project: "AIProjectClient") -> str:
                 logger.debug("Cached agent id invalid, will refresh: %s", e)
 
     # 2) Environment or Key Vault
-    agent_id = os.getenv("AZURE_AGENT_ID") or _load_agent_id_from_kv()
+    agent_id = os.getenv("AZURE_AGENT_ID") or await _load_agent_id_from_kv()
     if agent_id:
         try:
-            project.agents.get_agent(agent_id)
+            await project.agents.get_agent(agent_id)
             logger.info("Using existing agent id from env/KV: %s", agent_id)
             _cached_agent_id = agent_id
+            _cached_agent_expiry = time.monotonic() + AGENT_ID_TTL_SECONDS
             return agent_id
         except Exception as e:
             # Check if it's a 404 and log clearly
@@ -180,20 +356,21 @@ def _ensure_agent(project: "AIProjectClient") -> str:
 
     logger.info("Creating new agent using model=%s", model_name)
     try:
-        agent = project.agents.create_agent(model=model_name, name="The Globe Assistant", instructions="You are The Globe's helpful assistant.")
+        agent = await project.agents.create_agent(model=model_name, name="The Globe Assistant", instructions="You are The Globe's helpful assistant.")
     except Exception as create_err:
         logger.error("Failed to create agent with model=%s: %s", model_name, create_err, exc_info=True)
         raise RuntimeError(f"Failed to create agent: {create_err}") from create_err
     try:
-        _persist_agent_id_to_kv(agent.id)
+        await _persist_agent_id_to_kv(agent.id)
     except Exception as kv_err:
         logger.debug("Failed to persist agent id to KV (non-fatal): %s", kv_err)
     _cached_agent_id = agent.id
+    _cached_agent_expiry = time.monotonic() + AGENT_ID_TTL_SECONDS
     logger.info("Created agent id=%s", agent.id)
     return agent.id
 
 
-def _create_thread_and_post(
+async def _create_thread_and_post(
     project: "AIProjectClient",
     agent_id: str,
     user_message: str,
@@ -202,112 +379,82 @@ def _create_thread_and_post(
 ) -> Dict[str, str]:
     # Create or reuse a thread
     logger.info("Posting message to agent_id=%s conversation_id=%s", agent_id, conversation_id)
-    if conversation_id:
+    thread_id = None
+    if conversation_id and _thread_recently_seen(conversation_id):
+        thread_id = conversation_id
+    elif conversation_id:
         try:
-            # probe to see if thread exists
-            project.agents.messages.create(thread_id=conversation_id, role="user", content="[probe]")
+            # read-only probe: a GET leaves nothing behind in the thread
+            await project.agents.threads.get(conversation_id)
             thread_id = conversation_id
         except Exception:
-            thread = project.agents.threads.create()
-            thread_id = thread.id
-    else:
-        thread = project.agents.threads.create()
+            thread_id = None
+
+    if thread_id:
+        # the thread already holds the earlier turns, so only the new message is posted
+        try:
+            await project.agents.messages.create(thread_id=thread_id, role="user", content=user_message)
+        except Exception as e:
+            # e.g. a remembered thread that has since been deleted; start a fresh one
+            logger.warning("Posting to thread %s failed, creating a new thread: %s", thread_id, e)
+            _THREAD_LRU.pop(thread_id, None)
+            thread_id = None
+    if not thread_id:
+        # seed a new thread with the recent history (bounded) and the current message in one request;
+        # posting them as concurrent messages.create calls instead would not preserve their order
+        seed = [
+            {"role": msg.get("role", "user"), "content": msg["content"]}
+            for msg in (conversation_history or [])[-10:]
+            if msg.get("content")
+        ]
+        seed.append({"role": "user", "content": user_message})
+        thread = await project.agents.threads.create(messages=seed)
         thread_id = thread.id
+    _remember_thread(thread_id)
     logger.info("Using thread_id=%s", thread_id)
-
-    # replay recent history (bounded)
-    if conversation_history:
-        for msg in conversation_history[-10:]:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            if content:
-                project.agents.messages.create(thread_id=thread_id, role=role, content=content)
-
-    # post current message
-    project.agents.messages.create(thread_id=thread_id, role="user", content=user_message)
     logger.debug("Posted user message to thread %s: %s", thread_id, user_message)
 
-    # create and process run
-    run = project.agents.runs.create_and_process(thread_id=thread_id, agent_id=agent_id)
+    # create the run and poll it with backoff; create_and_process polls at a fixed 1s interval,
+    # which adds up to a second of tail latency to every reply
+    run = await project.agents.runs.create(thread_id=thread_id, agent_id=agent_id)
+    delay = RUN_POLL_INITIAL_DELAY
+    while getattr(run, "status", None) in _RUN_ACTIVE_STATUSES:
+        await asyncio.sleep(delay)
+        delay = min(delay * 1.5, RUN_POLL_MAX_DELAY)
+        run = await project.agents.runs.get(thread_id=thread_id, run_id=run.id)
     logger.info("Run created: id=%s status=%s", getattr(run, 'id', None), getattr(run, 'status', None))
     if getattr(run, "status", None) == "failed":
         logger.error("Agent run failed: %s", getattr(run, 'last_error', None))
         raise RuntimeError(f"Agent run failed: {getattr(run, 'last_error', None)}")
 
-    # read messages and return last assistant text (collect into list first)
-    messages_iter = project.agents.messages.list(thread_id=thread_id)
-    messages = list(messages_iter)
-
-    # Log previews for debugging
-    for m in messages:
-        try:
-            role = getattr(m, "role", "")
-            preview = None
-            if getattr(m, "text_messages", None):
-                preview = m.text_messages[-1].text.value
-            elif getattr(m, "content", None):
-                preview = m.content
-            preview_short = (preview[:200] + "...") if (preview and len(preview) > 200) else preview
-            logger.debug("Message role=%s preview=%s", role, preview_short)
-        except Exception:
-            logger.debug("Failed to preview a message")
-
-    # Find the latest assistant/agent message robustly.
+    # Find the latest assistant/agent message. The listing is requested newest-first, so the first
+    # assistant message with text is the reply; the pager only fetches further pages if needed.
     # Roles may be strings like 'assistant', 'MessageRole.AGENT', etc., so check for substrings.
-    def _get_msg_ts(obj) -> Optional[str]:
-        # Try common timestamp-like attributes; return string if found for lexicographic compare
-        for attr in ("created_on", "created_at", "created", "timestamp", "time", "createdDate", "create_time"):
-            val = getattr(obj, attr, None)
-            if val is not None:
-                try:
-                    return str(val)
-                except Exception:
-                    return None
-        return None
-
-    assistant_msgs = []
-    for m in messages:
+    def _get_msg_text(obj) -> Optional[str]:
         try:
-            role_val = str(getattr(m, "role", "")).lower()
-            if ("assistant" in role_val) or ("agent" in role_val):
-                assistant_msgs.append(m)
+            if getattr(obj, "text_messages", None):
+                return obj.text_messages[-1].text.value
+            return getattr(obj, "content", None) or None
         except Exception:
-            continue
+            return None
 
+    debug = logger.isEnabledFor(logging.DEBUG)
+    message_count = 0
     last_text = None
-    selection_reason = None
-    if assistant_msgs:
-        # Prefer timestamp-based selection if timestamps are available
-        ts_values = [(m, _get_msg_ts(m)) for m in assistant_msgs]
-        if any(ts for (_, ts) in ts_values):
-            # pick the message with the max timestamp string (ISO8601 sorts correctly)
-            chosen = max(ts_values, key=lambda t: t[1] or "")[0]
-            selection_reason = "timestamp"
-        else:
-            # No timestamps available; try to detect list ordering. Observed SDKs sometimes return
-            # newest-first. If the first message appears to be newer (heuristic: compare reprs),
-            # prefer the first assistant message; otherwise prefer the last.
-            first_role = str(getattr(messages[0], "role", "")).lower() if messages else ""
-            if "agent" in first_role or "assistant" in first_role:
-                # assume newest-first
-                chosen = next((m for m in messages if (("assistant" in str(getattr(m, "role", "")).lower()) or ("agent" in str(getattr(m, "role", "")).lower()))), assistant_msgs[-1])
-                selection_reason = "heuristic_newest_first"
-            else:
-                chosen = assistant_msgs[-1]
-                selection_reason = "heuristic_oldest_first"
-
-        # extract text from chosen
-        try:
-            if getattr(chosen, "text_messages", None):
-                last_text = chosen.text_messages[-1].text.value
-            elif getattr(chosen, "content", None):
-                last_text = chosen.content
-        except Exception:
-            last_text = None
+    async for m in project.agents.messages.list(thread_id=thread_id, order="desc", limit=MESSAGES_PAGE_SIZE):
+        message_count += 1
+        role_val = str(getattr(m, "role", "")).lower()
+        if debug:
+            preview = _get_msg_text(m)
+            preview_short = (preview[:200] + "...") if (preview and len(preview) > 200) else preview
+            logger.debug("Message role=%s preview=%s", role_val, preview_short)
+        if ("assistant" in role_val) or ("agent" in role_val):
+            last_text = _get_msg_text(m)
+            if last_text:
+                break
 
-    logger.info("Fetched %d messages from thread %s", len(messages), thread_id)
+    logger.info("Scanned %d messages from thread %s", message_count, thread_id)
     logger.info("Assistant last_text: %s", (last_text or '(no assistant response)'))
-    logger.debug("assistant_msgs_count=%d selection_reason=%s", len(assistant_msgs), selection_reason)
 
     # log conversation_history size
     try:
@@ -322,11 +469,7 @@ def _create_thread_and_post(
 async def chat_with_agent(
     user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None, conversation_id: Optional[str] = None
 ) -> Dict[str, str]:
-    """Async wrapper that runs blocking SDK calls off the event loop."""
-    project = _create_project_client()
-
-    def blocking():
-        agent_id = _ensure_agent(project)
-        return _create_thread_and_post(project, agent_id, user_message, conversation_history, conversation_id)
-
-    return await asyncio.to_thread(blocking)
+    """Ensure the agent exists, post the message to its thread and return the assistant's reply."""
+    project = get_project_client_for()
+    agent_id = await _ensure_agent(project)
+    return await _create_thread_and_post(project, agent_id, user_message, conversation_history, conversation_id)
@@ -1,50 +1,91 @@
 import asyncio
 
-import motor
 import pytest
-from fastapi.testclient import TestClient
+from asgi_lifespan import LifespanManager
+from bson import ObjectId
+from httpx import ASGITransport, AsyncClient
 from blog.app import app, settings
+from blog.models import __beanie_models__
+from pymongo import AsyncMongoClient
+from pymongo.errors import ConfigurationError
 
 TEST_DB_NAME = "test_db"
+# Collections the app writes to (Beanie defaults the collection name to the class name)
+TEST_COLLECTIONS = [getattr(model.Settings, "name", None) or model.__name__ for model in __beanie_models__]
+
+# Result of the connectivity probe, so it runs at most once per process
+_DB_REACHABLE = None
+_DB_UNREACHABLE_REASON = None
 
 
 @pytest.fixture(scope="session")
-def event_loop():
+async def app_client(initialize_database):
+    # Requests run directly on the test event loop (no TestClient thread portal).
+    # ASGITransport never sends lifespan events, so the app's startup/shutdown
+    # run exactly once here, after the test database has been prepared. One
+    # client serves the whole run and isolate_test handles per-test cleanup.
+    # No lifespan timeouts: startup allows up to 5s for the ping alone and then
+    # reconciles indexes against a possibly remote Cosmos account, which can
+    # outlast LifespanManager's 5s default on a cold run.
+    async with LifespanManager(app, startup_timeout=None, shutdown_timeout=None):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver") as client:
+            yield client
+
+
+def _connection_options(conn_str: str) -> dict:
     """
-    Redefine the event_loop fixture to be session scoped.
-    Requirement of pytest-asyncio if there are async fixtures
-    with non-function scope.
+    Timeouts for the test client. A single local mongod gets a direct connection
+    (no replica-set discovery) and a very short timeout, so runs without a local
+    DB skip almost immediately. directConnection is rejected for SRV URIs and
+    multi-host seed lists, and remote servers need time for the TLS handshake,
+    so anything else keeps the longer defaults.
     """
-    try:
-        return asyncio.get_running_loop()
-    except RuntimeError:
-        return asyncio.new_event_loop()
+    if conn_str.startswith("mongodb://"):
+        hosts = conn_str[len("mongodb://"):].split("/", 1)[0].rpartition("@")[2]
+        if "," not in hosts and hosts.rsplit(":", 1)[0] in ("localhost", "127.0.0.1"):
+            return {"directConnection": True, "serverSelectionTimeoutMS": 500, "connectTimeoutMS": 500}
+    return {"serverSelectionTimeoutMS": 1500, "connectTimeoutMS": 5000}
 
 
-@pytest.fixture()
-def app_client():
-    with TestClient(app) as client:
-        yield client
+@pytest.fixture(scope="session")
+async def mongo_client():
+    """
+    One pooled client for every fixture in the run, so server discovery and
+    TLS handshakes are paid once.
+    """
+    try:
+        client = AsyncMongoClient(
+            settings.AZURE_COSMOS_CONNECTION_STRING,
+            maxPoolSize=20,
+            minPoolSize=5,
+            # opportunistic wire compression; falls back to uncompressed if the server declines
+            compressors="zstd,zlib",
+            **_connection_options(settings.AZURE_COSMOS_CONNECTION_STRING),
+        )
+    except ConfigurationError as e:
+        # Missing or malformed connection string (InvalidURI is a ConfigurationError)
+        pytest.skip(f"Skipping DB tests because the Mongo/Cosmos connection string is invalid: {e}")
+    yield client
+    await client.close()
 
 
 @pytest.fixture(scope="session", autouse=True)
-async def initialize_database():
+async def initialize_database(mongo_client):
     settings.AZURE_COSMOS_DATABASE_NAME = TEST_DB_NAME
     # Attempt a short-lived connection to the configured Mongo/Cosmos DB.
     # If the DB is unreachable (auth/network), skip tests to avoid hard failures
     # during local development where the cloud DB may not be accessible.
-    try:
-        mongo_client = motor.motor_asyncio.AsyncIOMotorClient(
-            settings.AZURE_COSMOS_CONNECTION_STRING,
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=5000,
-        )
-        # Try a lightweight command to validate connectivity/auth
-        await mongo_client.admin.command("ping")
-    except Exception as e:
-        import pytest as _pytest
-
-        _pytest.skip(f"Skipping DB tests because Mongo/Cosmos is unreachable: {e}")
+    global _DB_REACHABLE, _DB_UNREACHABLE_REASON
+    if _DB_REACHABLE is None:
+        try:
+            # Try a lightweight command to validate connectivity/auth
+            await mongo_client.admin.command("ping")
+            _DB_REACHABLE = True
+        except Exception as e:
+            _DB_REACHABLE = False
+            _DB_UNREACHABLE_REASON = e
+    if not _DB_REACHABLE:
+        pytest.skip(f"Skipping DB tests because Mongo/Cosmos is unreachable: {_DB_UNREACHABLE_REASON}")
 
     # If we get here, DB is reachable; drop the test database to ensure a clean slate
     try:
@@ -59,3 +100,18 @@ async def initialize_database():
         await mongo_client.drop_database(TEST_DB_NAME)
     except Exception:
         pass
+
+
+@pytest.fixture(autouse=True)
+async def isolate_test(mongo_client, initialize_database):
+    """
+    Remove only the documents a test wrote, instead of recreating the database.
+    Ids are ObjectIds generated in this process, so everything inserted during the
+    test sorts after a marker id taken when it starts.
+    """
+    marker = ObjectId()
+    yield
+    db = mongo_client[TEST_DB_NAME]
+    await asyncio.gather(
+        *(db[name].delete_many({"_id": {"$gte": marker}}) for name in TEST_COLLECTIONS)
+    )
@@ -0,0 +1,35 @@
+import pytest
+
+func = pytest.importorskip("azure.functions")
+from azure.functions._http_asgi import AsgiRequest
+
+from catchAllFunction import _build_scope
+
+
+# The adapter is exercised without a database, so replace the autouse DB fixtures
+@pytest.fixture(autouse=True)
+def initialize_database():
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolate_test():
+    yield
+
+
+def test_build_scope_matches_asgi_request_for_escaped_path():
+    req = func.HttpRequest(
+        method="GET",
+        url="https://host/posts/caf%C3%A9?q=1",
+        headers={"accept": "application/json"},
+        body=b"",
+    )
+    scope = _build_scope(req)
+    expected = AsgiRequest(req).to_asgi_http_scope()
+
+    assert scope["path"] == "/posts/café"
+    for key in ("type", "http_version", "method", "scheme", "path", "query_string", "root_path", "headers", "server", "client"):
+        assert scope[key] == expected[key], key
+    # raw_path keeps the bytes as sent, where AsgiRequest re-encodes the decoded path
+    assert scope["raw_path"] == b"/posts/caf%C3%A9"
+    assert {k for k in expected if k.startswith("azure_functions.")} <= scope.keys()
@@ -1,73 +1,101 @@
-def test_blog_post_and_comments_crud(app_client):
-    # Ensure a clean slate: delete any pre-existing posts (from previous runs)
-    existing = app_client.get("/posts")
-    assert existing.status_code == 200
-    for p in existing.json():
-        app_client.delete(f"/posts/{p['id']}")
-
-    # Create two blog posts
-    first = app_client.post(
-        "/posts",
-        json={
-            "title": "First Post",
-            "content": "Content of first post",
-            "excerpt": "Excerpt 1",
-            "author": "Alice",
-            "slug": "first-post",
-            "published": True
-        },
+import asyncio
+
+import orjson
+
+# Request bodies are serialized once at import and sent as raw bytes
+JSON_HEADERS = {"content-type": "application/json"}
+FIRST_POST = orjson.dumps({
+    "title": "First Post",
+    "content": "Content of first post",
+    "excerpt": "Excerpt 1",
+    "author": "Alice",
+    # Stored normalized as "first-post"
+    "slug": " First-Post ",
+    "published": True
+})
+SECOND_POST = orjson.dumps({
+    "title": "Second Post",
+    "content": "Content of second post",
+    "excerpt": "Excerpt 2",
+    "author": "Bob",
+    "slug": "second-post",
+    "published": False
+})
+SECOND_POST_UPDATE = orjson.dumps({
+    "title": "Second Post Updated",
+    "content": "Content of second post",
+    "excerpt": "Excerpt 2",
+    "author": "Bob",
+    "slug": "second-post",
+    "published": True
+})
+NEW_COMMENT = orjson.dumps({
+    "author": "Charlie",
+    "content": "Great post!",
+    "approved": False
+})
+REPLY_COMMENT = orjson.dumps({
+    "author": "Dana",
+    "content": "Thanks for sharing",
+    "approved": False
+})
+CATEGORY = orjson.dumps({
+    "name": "News",
+    "slug": "news"
+})
+APPROVED_COMMENT = orjson.dumps({
+    "author": "Charlie",
+    "content": "Great post!",
+    "approved": True
+})
+
+
+async def test_blog_post_and_comments_crud(app_client):
+    # The test database starts empty (dropped by initialize_database) and
+    # isolate_test removes what each test writes, so no cleanup is needed here.
+
+    # Create two blog posts (independent, so sent concurrently)
+    first, second = await asyncio.gather(
+        app_client.post("/posts", content=FIRST_POST, headers=JSON_HEADERS),
+        app_client.post("/posts", content=SECOND_POST, headers=JSON_HEADERS),
     )
     assert first.status_code == 201, first.text
     assert first.headers["Location"].startswith("http://testserver/posts/")
-
-    second = app_client.post(
-        "/posts",
-        json={
-            "title": "Second Post",
-            "content": "Content of second post",
-            "excerpt": "Excerpt 2",
-            "author": "Bob",
-            "slug": "second-post",
-            "published": False
-        },
-    )
     assert second.status_code == 201, second.text
 
-    # List posts
-    list_resp = app_client.get("/posts")
+    # List posts, full and summary
+    list_resp, summary_resp = await asyncio.gather(
+        app_client.get("/posts"),
+        app_client.get("/posts", params={"summary": "true"}),
+    )
     assert list_resp.status_code == 200
     posts = list_resp.json()
     assert len(posts) == 2
-    # Order not guaranteed; verify by titles set
-    titles = {p["title"] for p in posts}
-    assert {"First Post", "Second Post"} == titles
-    first_id = next(p["id"] for p in posts if p["title"] == "First Post")
-    second_id = next(p["id"] for p in posts if p["title"] == "Second Post")
-
-    # Get single post
-    get_first = app_client.get(f"/posts/{first_id}")
+    # Newest publishedDate first; the unpublished second post has none, so it sorts last
+    assert [p["title"] for p in posts] == ["First Post", "Second Post"]
+    first_id, second_id = (p["id"] for p in posts)
+
+    # Summary listing omits the content body
+    assert summary_resp.status_code == 200
+    summaries = summary_resp.json()
+    assert {p["id"] for p in summaries} == {first_id, second_id}
+    assert all("content" not in p for p in summaries)
+
+    # Get single post, and a bad ID (24 hex chars but unlikely to exist)
+    get_first, not_found = await asyncio.gather(
+        app_client.get(f"/posts/{first_id}"),
+        app_client.get("/posts/61958439e0dbd854f5ab9000"),
+    )
     assert get_first.status_code == 200
     post_body = get_first.json()
     assert post_body["title"] == "First Post"
     assert post_body["author"] == "Alice"
+    assert post_body["slug"] == "first-post"
     assert post_body["createdDate"] is not None
-
-    # Bad ID (24 hex chars but unlikely to exist)
-    not_found = app_client.get("/posts/61958439e0dbd854f5ab9000")
     assert not_found.status_code == 404
 
     # Update second post -> publish and change title
-    upd = app_client.put(
-        f"/posts/{second_id}",
-        json={
-            "title": "Second Post Updated",
-            "content": "Content of second post",
-            "excerpt": "Excerpt 2",
-            "author": "Bob",
-            "slug": "second-post",
-            "published": True
-        },
-    )
+    upd = await app_client.put(f"/posts/{second_id}", content=SECOND_POST_UPDATE, headers=JSON_HEADERS)
     assert upd.status_code == 200, upd.text
     upd_json = upd.json()
     assert upd_json["title"] == "Second Post Updated"
@@ -75,53 +103,73 @@ def test_blog_post_and_comments_crud(app_client):
     assert upd_json["published"] is True
 
     # Create a comment on first post
-    comment_resp = app_client.post(
-        f"/posts/{first_id}/comments",
-        json={
-            "author": "Charlie",
-            "content": "Great post!",
-            "approved": False
-        },
-    )
+    comment_resp = await app_client.post(f"/posts/{first_id}/comments", content=NEW_COMMENT, headers=JSON_HEADERS)
     assert comment_resp.status_code == 201, comment_resp.text
     assert comment_resp.headers["Location"].startswith(f"http://testserver/posts/{first_id}/comments/")
     comment_id = comment_resp.json()["id"]
+    # Created after the first one, so it must be listed before it
+    reply_resp = await app_client.post(f"/posts/{first_id}/comments", content=REPLY_COMMENT, headers=JSON_HEADERS)
+    assert reply_resp.status_code == 201, reply_resp.text
+    reply_id = reply_resp.json()["id"]
 
-    # List comments
-    comments_list = app_client.get(f"/posts/{first_id}/comments")
+    # List comments, newest first
+    comments_list = await app_client.get(f"/posts/{first_id}/comments")
     assert comments_list.status_code == 200
     comments = comments_list.json()
-    assert len(comments) == 1
-    assert comments[0]["author"] == "Charlie"
-    assert comments[0]["content"] == "Great post!"
+    assert [c["id"] for c in comments] == [reply_id, comment_id]
+    assert comments[1]["author"] == "Charlie"
+    assert comments[1]["content"] == "Great post!"
 
     # Update comment (approve)
-    upd_comment = app_client.put(
-        f"/posts/{first_id}/comments/{comment_id}",
-        json={
-            "author": "Charlie",
-            "content": "Great post!",
-            "approved": True
-        },
+    upd_comment = await app_client.put(
+        f"/posts/{first_id}/comments/{comment_id}", content=APPROVED_COMMENT, headers=JSON_HEADERS
     )
     assert upd_comment.status_code == 200, upd_comment.text
     assert upd_comment.json()["approved"] is True
 
+    # A comment addressed through another post's URL is not found, and is left untouched
+    wrong_post_put, wrong_post_delete = await asyncio.gather(
+        app_client.put(f"/posts/{second_id}/comments/{comment_id}", content=NEW_COMMENT, headers=JSON_HEADERS),
+        app_client.delete(f"/posts/{second_id}/comments/{comment_id}"),
+    )
+    assert wrong_post_put.status_code == 404
+    assert wrong_post_delete.status_code == 404
+    still_there = await app_client.get(f"/posts/{first_id}/comments")
+    assert next(c for c in still_there.json() if c["id"] == comment_id)["approved"] is True
+
     # Delete comment
-    del_comment = app_client.delete(f"/posts/{first_id}/comments/{comment_id}")
+    del_comment = await app_client.delete(f"/posts/{first_id}/comments/{comment_id}")
     assert del_comment.status_code == 204
     # Verify deleted
-    comments_after = app_client.get(f"/posts/{first_id}/comments")
+    comments_after = await app_client.get(f"/posts/{first_id}/comments")
     assert comments_after.status_code == 200
-    assert comments_after.json() == []
+    assert [c["id"] for c in comments_after.json()] == [reply_id]
 
     # Delete a post
-    del_post = app_client.delete(f"/posts/{second_id}")
+    del_post = await app_client.delete(f"/posts/{second_id}")
     assert del_post.status_code == 204
-    check_deleted = app_client.get(f"/posts/{second_id}")
+    check_deleted = await app_client.get(f"/posts/{second_id}")
     assert check_deleted.status_code == 404
 
     # Remaining posts list should be 1
-    remaining = app_client.get("/posts")
+    remaining = await app_client.get("/posts")
     assert remaining.status_code == 200
     assert len(remaining.json()) == 1
+
+
+async def test_update_and_delete_missing_resources(app_client):
+    # 24 hex chars, so the id parses but matches nothing
+    missing_id = "61958439e0dbd854f5ab9000"
+    post = await app_client.post("/posts", content=FIRST_POST, headers=JSON_HEADERS)
+    assert post.status_code == 201, post.text
+    post_id = post.json()["id"]
+
+    responses = await asyncio.gather(
+        app_client.put(f"/categories/{missing_id}", content=CATEGORY, headers=JSON_HEADERS),
+        app_client.delete(f"/categories/{missing_id}"),
+        app_client.put(f"/posts/{missing_id}", content=FIRST_POST, headers=JSON_HEADERS),
+        app_client.delete(f"/posts/{missing_id}"),
+        app_client.put(f"/posts/{post_id}/comments/{missing_id}", content=NEW_COMMENT, headers=JSON_HEADERS),
+        app_client.delete(f"/posts/{post_id}/comments/{missing_id}"),
+    )
+    assert [r.status_code for r in responses] == [404] * len(responses), [r.text for r in responses]